@@ -1,12 +1,11 @@
 from flask import Flask, render_template, jsonify, request
 from database import SensorDatabase
 from test_data_generator import generate_test_data
-from config import SENSOR_CONFIG, SENSOR_LOCATIONS
+from config import SENSOR_CONFIG, SENSOR_LOCATIONS, ARCHIVE_CONFIG
 import json
 from datetime import datetime, timedelta
 from flask import send_from_directory
 import os
-import psycopg2
 
 app = Flask(__name__)
 
@@ -86,27 +85,16 @@ def receive_esp32_data():
 def get_real_sensor_latest():
     """Получаем последние данные реального датчика"""
     try:
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT temperature, pressure, humidity, gas_composition, noise_level, timestamp 
-            FROM sensor_readings 
-            WHERE sensor_id = 99 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        ''')
-        
-        result = cursor.fetchone()
+        result = db.get_latest_reading(99)
         
         if result:
             data = {
-                'temperature': result[0],
-                'pressure': result[1],
-                'humidity': result[2],
-                'gas_composition': result[3],
-                'noise_level': result[4],
-                'timestamp': result[5].strftime('%Y-%m-%d %H:%M:%S'),
+                'temperature': result['temperature'],
+                'pressure': result['pressure'],
+                'humidity': result['humidity'],
+                'gas_composition': result['gas_composition'],
+                'noise_level': result['noise_level'],
+                'timestamp': result['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
                 'success': True
             }
         else:
@@ -182,18 +170,7 @@ def get_sensor_data(sensor_id):
 def get_real_sensor_data():
     """Получаем данные реального датчика (только последние значения)"""
     try:
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT temperature, pressure, humidity, gas_composition, noise_level, timestamp 
-            FROM sensor_readings 
-            WHERE sensor_id = 99 
-            ORDER BY timestamp DESC 
-            LIMIT 1
-        ''')
-        
-        result = cursor.fetchone()
+        result = db.get_latest_reading(99)
         
         if result:
             # Для реального датчика возвращаем только последние значения
@@ -202,35 +179,35 @@ def get_real_sensor_data():
                 'datasets': [
                     {
                         'label': 'Температура',
-                        'data': [result[0]],
+                        'data': [result['temperature']],
                         'borderColor': '#0D6A77',
                         'backgroundColor': 'rgba(13, 106, 119, 0.1)',
                         'yAxisID': 'y'
                     },
                     {
                         'label': 'Давление',
-                        'data': [result[1]],
+                        'data': [result['pressure']],
                         'borderColor': '#4FA8B5',
                         'backgroundColor': 'rgba(79, 168, 181, 0.1)',
                         'yAxisID': 'y1'
                     },
                     {
                         'label': 'Влажность',
-                        'data': [result[2]],
+                        'data': [result['humidity']],
                         'borderColor': '#2E8B57',
                         'backgroundColor': 'rgba(46, 139, 87, 0.1)',
                         'yAxisID': 'y'
                     },
                     {
                         'label': 'Уровень CO₂',
-                        'data': [result[3]],
+                        'data': [result['gas_composition']],
                         'borderColor': '#8A2BE2',
                         'backgroundColor': 'rgba(138, 43, 226, 0.1)',
                         'yAxisID': 'y1'
                     },
                     {
                         'label': 'Уровень шума',
-                        'data': [result[4]],
+                        'data': [result['noise_level']],
                         'borderColor': '#FF6347',
                         'backgroundColor': 'rgba(255, 99, 71, 0.1)',
                         'yAxisID': 'y'
@@ -249,15 +226,8 @@ def get_real_sensor_data():
 @app.route('/api/system_stats')
 def get_system_stats():
     try:
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM sensor_readings')
-        total_records = cursor.fetchone()[0]
-        
-        cutoff_time = datetime.now() - timedelta(hours=24)
-        cursor.execute('SELECT COUNT(DISTINCT sensor_id) FROM sensor_readings WHERE timestamp > %s', (cutoff_time,))
-        active_sensors = cursor.fetchone()[0]
+        total_records = db.count_readings()
+        active_sensors = db.count_active_sensors(hours=24)
         
         return jsonify({
             'total_records': total_records,
@@ -298,10 +268,7 @@ def api_generate_test_data():
         days = request.args.get('days', 1, type=int)
         records = generate_test_data(days)
         
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM sensor_readings')
-        total_records = cursor.fetchone()[0]
+        total_records = db.count_readings()
         
         return jsonify({
             'success': True, 
@@ -316,18 +283,29 @@ def api_generate_test_data():
 def api_clear_data():
     try:
         # Очищаем только тестовые данные, оставляем данные реального датчика
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM sensor_readings WHERE sensor_id != 99')
-        conn.commit()
-        
-        cursor.execute('SELECT COUNT(*) FROM sensor_readings')
-        total_records = cursor.fetchone()[0]
+        db.delete_readings(exclude_sensor_id=99)
+        total_records = db.count_readings()
         
         return jsonify({'success': True, 'total_records': total_records})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@app.route('/api/archive_data')
+def api_archive_data():
+    """Переносит старые показания в архив (холодное хранилище)"""
+    try:
+        days = request.args.get('days', ARCHIVE_CONFIG['after_days'], type=int)
+        archived_records = db.archive_old_readings(days)
+        
+        return jsonify({
+            'success': True,
+            'archived_records': archived_records,
+            'archive_records': db.archive.count(),
+            'archive_size_bytes': db.archive.size_bytes()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/api/sensor_config')
 def get_sensor_config():
     """Отдаем конфигурацию датчиков в JavaScript"""
@@ -343,13 +321,8 @@ def get_sensor_locations():
 def api_clear_real_sensor_data():
     try:
         # Очищаем только данные реального датчика
-        conn = db._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM sensor_readings WHERE sensor_id = 99')
-        conn.commit()
-        
-        cursor.execute('SELECT COUNT(*) FROM sensor_readings WHERE sensor_id = 99')
-        remaining_records = cursor.fetchone()[0]
+        db.delete_readings(sensor_id=99)
+        remaining_records = db.count_readings(99)
         
         return jsonify({'success': True, 'remaining_records': remaining_records})
     except Exception as e:
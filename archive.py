@@ -0,0 +1,600 @@
+import os
+import mmap
+import math
+import struct
+import datetime
+import threading
+import numpy as np
+from collections import Counter, OrderedDict
+from config import ARCHIVE_CONFIG
+# Столбцы сегмента идут в том же порядке, что и в таблице sensor_readings
+from storage import VALUE_COLUMNS
+
+EPOCH = datetime.datetime(1970, 1, 1)
+ONE_US = datetime.timedelta(microseconds=1)
+
+SEGMENT_MAGIC = b'RBSG'
+SEGMENT_VERSION = 1
+SEGMENT_SUFFIX = '.seg'
+
+# magic, версия, sensor_id, количество строк, первая и последняя метка времени (мкс)
+_HEADER = struct.Struct('<4sBiIqq')
+# Длины столбцов в байтах: метки времени + 5 значений
+_LENGTHS = struct.Struct('<6I')
+# Для каждого значения: количество не-NULL, сумма, минимум, максимум
+_COLUMN_STATS = struct.Struct('<Iddd')
+# Размер заголовка вместе с длинами столбцов и статистикой
+_META_SIZE = _HEADER.size + _LENGTHS.size + _COLUMN_STATS.size * len(VALUE_COLUMNS)
+
+# Корзины delta-of-delta для меток времени (префикс, длина префикса, разрядность).
+# Как в Gorilla, но разрядности увеличены: храним микросекунды, а не секунды
+_DOD_BUCKETS = [
+    (0b10, 2, 14),
+    (0b110, 3, 24),
+    (0b1110, 4, 32),
+    (0b1111, 4, 64),
+]
+
+
+def to_micros(ts):
+    """datetime -> микросекунды от эпохи"""
+    return (ts - EPOCH) // ONE_US
+
+
+def from_micros(us):
+    """Микросекунды от эпохи -> datetime"""
+    return EPOCH + datetime.timedelta(microseconds=us)
+
+
+class _BitWriter:
+    """Побитовая запись: накопитель в int, целые байты сбрасываются в bytearray"""
+
+    def __init__(self):
+        self._out = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    def write(self, value, nbits):
+        if not nbits:
+            return
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._nbits += nbits
+        if self._nbits >= 8:
+            rest = self._nbits & 7
+            self._out += (self._acc >> rest).to_bytes(self._nbits >> 3, 'big')
+            self._acc &= (1 << rest) - 1
+            self._nbits = rest
+
+    def to_bytes(self):
+        if self._nbits:
+            self._out.append((self._acc << (8 - self._nbits)) & 0xFF)
+            self._acc = self._nbits = 0
+        return bytes(self._out)
+
+
+def _read_bits(view, pos, nbits):
+    """Читает nbits бит с позиции pos прямо из буфера (bytes/memoryview над mmap)"""
+    start = pos >> 3
+    end = (pos + nbits + 7) >> 3
+    return (int.from_bytes(view[start:end], 'big') >> ((end << 3) - pos - nbits)) & ((1 << nbits) - 1)
+
+
+def _signed(value, nbits):
+    if value >= 1 << (nbits - 1):
+        value -= 1 << nbits
+    return value
+
+
+def _float_bits(value):
+    if value is None:
+        value = math.nan
+    return struct.unpack('<Q', struct.pack('<d', value))[0]
+
+
+def encode_timestamps(values):
+    """Кодирование меток времени (мкс) методом delta-of-delta"""
+    writer = _BitWriter()
+    if not values:
+        return b''
+
+    writer.write(values[0], 64)
+    prev, prev_delta = values[0], 0
+    for value in values[1:]:
+        delta = value - prev
+        dod = delta - prev_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_len, nbits in _DOD_BUCKETS:
+                if -(1 << (nbits - 1)) <= dod < (1 << (nbits - 1)):
+                    writer.write(prefix, prefix_len)
+                    writer.write(dod, nbits)
+                    break
+        prev, prev_delta = value, delta
+    return writer.to_bytes()
+
+
+def decode_timestamps(data, count):
+    """Метки времени (мкс) в виде numpy-массива int64"""
+    if not count:
+        return np.empty(0, dtype=np.int64)
+
+    view = memoryview(data)
+    first = _signed(_read_bits(view, 0, 64), 64)
+    pos = 64
+    dods = [0] * count
+    last_bucket = len(_DOD_BUCKETS)
+    for i in range(1, count):
+        if not (view[pos >> 3] >> (7 - (pos & 7))) & 1:
+            pos += 1
+            continue
+        pos += 1
+        for prefix_len, (_, _, nbits) in enumerate(_DOD_BUCKETS, start=1):
+            if prefix_len == last_bucket:
+                break
+            bit = (view[pos >> 3] >> (7 - (pos & 7))) & 1
+            pos += 1
+            if not bit:
+                break
+        dods[i] = _signed(_read_bits(view, pos, nbits), nbits)
+        pos += nbits
+    view.release()
+
+    # delta-of-delta -> дельты -> значения
+    deltas = np.cumsum(np.array(dods, dtype=np.int64))
+    return first + np.cumsum(deltas)
+
+
+def encode_floats(values):
+    """Кодирование значений XOR-сжатием (Gorilla). NULL хранится как NaN"""
+    writer = _BitWriter()
+    if not values:
+        return b''
+
+    prev = _float_bits(values[0])
+    writer.write(prev, 64)
+    prev_leading, prev_trailing = -1, 0
+    for value in values[1:]:
+        bits = _float_bits(value)
+        xor = bits ^ prev
+        if xor == 0:
+            writer.write(0, 1)
+        else:
+            writer.write(1, 1)
+            leading = min(64 - xor.bit_length(), 31)
+            trailing = (xor & -xor).bit_length() - 1
+            if prev_leading >= 0 and leading >= prev_leading and trailing >= prev_trailing:
+                # Значимые биты помещаются в предыдущее окно
+                writer.write(0, 1)
+                writer.write(xor >> prev_trailing, 64 - prev_leading - prev_trailing)
+            else:
+                meaningful = 64 - leading - trailing
+                writer.write(1, 1)
+                writer.write(leading, 5)
+                writer.write(meaningful & 0x3F, 6)
+                writer.write(xor >> trailing, meaningful)
+                prev_leading, prev_trailing = leading, trailing
+        prev = bits
+    return writer.to_bytes()
+
+
+def decode_floats(data, count):
+    """Значения в виде numpy-массива float64 (NULL -> NaN)"""
+    if not count:
+        return np.empty(0, dtype=np.float64)
+
+    view = memoryview(data)
+    from_bytes = int.from_bytes
+    prev = _read_bits(view, 0, 64)
+    pos = 64
+    bits = [prev] * count
+    trailing, width, mask = 0, 64, (1 << 64) - 1
+    for i in range(1, count):
+        if (view[pos >> 3] >> (7 - (pos & 7))) & 1:
+            pos += 1
+            if (view[pos >> 3] >> (7 - (pos & 7))) & 1:
+                header = _read_bits(view, pos + 1, 11)
+                width = (header & 0x3F) or 64
+                trailing = 64 - (header >> 6) - width
+                mask = (1 << width) - 1
+                pos += 12
+            else:
+                pos += 1
+            # Горячий путь: чтение значимых бит без вызова _read_bits
+            start, end = pos >> 3, (pos + width + 7) >> 3
+            prev ^= ((from_bytes(view[start:end], 'big') >> ((end << 3) - pos - width)) & mask) << trailing
+            pos += width
+        else:
+            pos += 1
+        bits[i] = prev
+    view.release()
+    return np.array(bits, dtype=np.uint64).view(np.float64)
+
+
+class ArchiveSegment:
+    """Сегмент архива: показания одного датчика за один период в колоночном виде"""
+
+    def __init__(self, path, header_only=False):
+        """
+        header_only - прочитать только заголовок и статистику столбцов
+        обычным read, без mmap всего файла (для count и statistics)
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            if header_only:
+                self._mm = None
+                buffer = f.read(_META_SIZE)
+            else:
+                self._mm = buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(buffer) < _META_SIZE:
+            self.close()
+            raise ValueError(f"Некорректный сегмент архива: {path}")
+        magic, version, self.sensor_id, self.count, self.first_ts, self.last_ts = \
+            _HEADER.unpack_from(buffer, 0)
+        if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+            self.close()
+            raise ValueError(f"Некорректный сегмент архива: {path}")
+
+        offset = _HEADER.size
+        lengths = _LENGTHS.unpack_from(buffer, offset)
+        offset += _LENGTHS.size
+
+        self.column_stats = {}
+        for column in VALUE_COLUMNS:
+            valid, total, low, high = _COLUMN_STATS.unpack_from(buffer, offset)
+            self.column_stats[column] = {'count': valid, 'sum': total, 'min': low, 'max': high}
+            offset += _COLUMN_STATS.size
+
+        self._spans = {}
+        for column, length in zip(['timestamp'] + VALUE_COLUMNS, lengths):
+            self._spans[column] = (offset, offset + length)
+            offset += length
+
+    def _decode(self, column, decoder):
+        # memoryview над mmap: данные столбца читаются без копирования
+        start, end = self._spans[column]
+        with memoryview(self._mm) as view, view[start:end] as data:
+            return decoder(data, self.count)
+
+    def read_timestamps(self):
+        return self._decode('timestamp', decode_timestamps)
+
+    def read_column(self, column):
+        return self._decode(column, decode_floats)
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def write(path, sensor_id, rows):
+        """
+        Записывает сегмент. rows - список кортежей
+        (timestamp_us, noise_level, gas_composition, pressure, humidity, temperature),
+        отсортированных по времени
+        """
+        timestamps = [row[0] for row in rows]
+        blocks = [encode_timestamps(timestamps)]
+        stats = b''
+        for i, column in enumerate(VALUE_COLUMNS, start=1):
+            values = [row[i] for row in rows]
+            blocks.append(encode_floats(values))
+            valid = [v for v in values if v is not None and not math.isnan(v)]
+            stats += _COLUMN_STATS.pack(
+                len(valid),
+                math.fsum(valid),
+                min(valid) if valid else math.nan,
+                max(valid) if valid else math.nan
+            )
+
+        header = _HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, sensor_id, len(rows),
+                              timestamps[0], timestamps[-1])
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(_LENGTHS.pack(*[len(block) for block in blocks]))
+            f.write(stats)
+            for block in blocks:
+                f.write(block)
+        os.replace(tmp_path, path)
+
+
+class SensorArchive:
+    """
+    Холодное хранилище: сжатые колоночные сегменты на локальном диске,
+    по одному файлу на датчик и период (день или месяц)
+    """
+
+    def __init__(self, path=ARCHIVE_CONFIG['path'], period=ARCHIVE_CONFIG['period'],
+                 cache_bytes=ARCHIVE_CONFIG['cache_bytes']):
+        if period not in ('day', 'month'):
+            raise ValueError(f"Неизвестный период архивации: {period}")
+        self.path = path
+        self.period = period
+        os.makedirs(self.path, exist_ok=True)
+
+        # Сегменты не меняются после записи (кроме перезаписи при append),
+        # поэтому распакованные столбцы можно кешировать по (mtime, size) файла
+        self.cache_bytes = cache_bytes
+        self._cache = OrderedDict()
+        self._cache_size = 0
+        self._cache_lock = threading.Lock()
+        # Заголовки сегментов для count и statistics (/api/system_stats
+        # опрашивается постоянно): по одной маленькой записи на сегмент
+        self._headers = {}
+
+    # ----- Периоды и пути -----
+
+    def _period_start(self, ts):
+        if self.period == 'month':
+            return datetime.datetime(ts.year, ts.month, 1)
+        return datetime.datetime(ts.year, ts.month, ts.day)
+
+    def _period_end(self, start):
+        if self.period == 'month':
+            return datetime.datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return start + datetime.timedelta(days=1)
+
+    def _period_key(self, start):
+        return start.strftime('%Y-%m' if self.period == 'month' else '%Y-%m-%d')
+
+    def _parse_period_key(self, key):
+        # fromisoformat заметно быстрее strptime, а ключ разбирается для каждого файла
+        if len(key) != (7 if self.period == 'month' else 10):
+            raise ValueError(f"Некорректный период сегмента: {key}")
+        return datetime.datetime.fromisoformat(key + '-01' if self.period == 'month' else key)
+
+    def _sensor_dir(self, sensor_id):
+        return os.path.join(self.path, f'sensor_{sensor_id}')
+
+    def _segment_path(self, sensor_id, period_start):
+        return os.path.join(self._sensor_dir(sensor_id), self._period_key(period_start) + SEGMENT_SUFFIX)
+
+    def sensor_ids(self):
+        ids = []
+        if os.path.isdir(self.path):
+            for name in os.listdir(self.path):
+                if name.startswith('sensor_'):
+                    try:
+                        ids.append(int(name[len('sensor_'):]))
+                    except ValueError:
+                        continue
+        return sorted(ids)
+
+    def _segment_paths(self, sensor_id, start=None, end=None):
+        """Пути сегментов датчика, период которых пересекается с [start, end]"""
+        sensor_dir = self._sensor_dir(sensor_id)
+        if not os.path.isdir(sensor_dir):
+            return []
+
+        paths = []
+        for name in sorted(os.listdir(sensor_dir)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                period_start = self._parse_period_key(name[:-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            if start is not None and self._period_end(period_start) <= start:
+                continue
+            if end is not None and period_start > end:
+                continue
+            paths.append(os.path.join(sensor_dir, name))
+        return paths
+
+    # ----- Запись -----
+
+    def append(self, sensor_id, rows):
+        """
+        Добавляет строки в архив датчика, объединяя их с уже существующими сегментами.
+        rows - кортежи (timestamp, noise_level, gas_composition, pressure, humidity, temperature).
+        Возвращает количество реально добавленных строк (без дубликатов)
+        """
+        by_period = {}
+        for row in rows:
+            period_start = self._period_start(row[0])
+            by_period.setdefault(period_start, []).append(
+                (to_micros(row[0]),) + tuple(None if v is None else float(v) for v in row[1:])
+            )
+
+        os.makedirs(self._sensor_dir(sensor_id), exist_ok=True)
+        added = 0
+        for period_start, period_rows in by_period.items():
+            path = self._segment_path(sensor_id, period_start)
+            existing = self._read_rows(path) if os.path.exists(path) else []
+            period_rows = self._new_rows(period_rows, existing)
+            if period_rows:
+                ArchiveSegment.write(path, sensor_id, sorted(existing + period_rows, key=lambda row: row[0]))
+            added += len(period_rows)
+
+        return added
+
+    @staticmethod
+    def _row_key(row):
+        # NaN != NaN, поэтому в ключе NULL всегда None
+        return tuple(None if v is not None and v != v else v for v in row)
+
+    def _new_rows(self, rows, existing):
+        """
+        Строки rows, которых еще нет в сегменте. Повторная архивация после сбоя
+        не должна дублировать строки, но одинаковые показания с одной меткой
+        времени - это разные записи: пропускается ровно столько копий строки,
+        сколько их уже лежит в сегменте
+        """
+        stored = Counter(self._row_key(row) for row in existing)
+        new_rows = []
+        for row in rows:
+            key = self._row_key(row)
+            if stored[key]:
+                stored[key] -= 1
+            else:
+                new_rows.append(row)
+        return new_rows
+
+    @staticmethod
+    def _read_rows(path):
+        with ArchiveSegment(path) as segment:
+            columns = [segment.read_timestamps().tolist()] + \
+                [segment.read_column(c).tolist() for c in VALUE_COLUMNS]
+        return list(zip(*columns))
+
+    def clear(self, sensor_ids=None):
+        """Удаляет архив указанных датчиков (или всех)"""
+        if sensor_ids is None:
+            sensor_ids = self.sensor_ids()
+        for sensor_id in sensor_ids:
+            for path in self._segment_paths(sensor_id):
+                os.remove(path)
+                with self._cache_lock:
+                    self._headers.pop(path, None)
+            sensor_dir = self._sensor_dir(sensor_id)
+            if os.path.isdir(sensor_dir) and not os.listdir(sensor_dir):
+                os.rmdir(sensor_dir)
+
+    # ----- Чтение -----
+
+    def _read_header(self, path):
+        """Заголовок сегмента (из кеша, если файл не менялся)"""
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._cache_lock:
+            cached = self._headers.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with ArchiveSegment(path, header_only=True) as segment:
+            pass
+        with self._cache_lock:
+            self._headers[path] = (stamp, segment)
+        return segment
+
+    def _load_columns(self, path):
+        """Распакованные столбцы сегмента (из кеша, если файл не менялся)"""
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._cache_lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(path)
+                return cached[1]
+
+        with ArchiveSegment(path) as segment:
+            columns = {'timestamp': segment.read_timestamps()}
+            for column in VALUE_COLUMNS:
+                columns[column] = segment.read_column(column)
+
+        size = sum(values.nbytes for values in columns.values())
+        with self._cache_lock:
+            old = self._cache.pop(path, None)
+            if old is not None:
+                self._cache_size -= old[2]
+            if size <= self.cache_bytes:
+                self._cache[path] = (stamp, columns, size)
+                self._cache_size += size
+                while self._cache_size > self.cache_bytes:
+                    _, (_, _, evicted) = self._cache.popitem(last=False)
+                    self._cache_size -= evicted
+        return columns
+
+    def read(self, sensor_id, start=None, end=None):
+        """
+        Показания датчика за интервал (start, end] в виде словаря numpy-массивов,
+        отсортированные по возрастанию времени. Метки времени - datetime64[us]
+        """
+        chunks = {column: [] for column in ['timestamp'] + VALUE_COLUMNS}
+        start_us = to_micros(start) if start is not None else None
+        end_us = to_micros(end) if end is not None else None
+
+        for path in self._segment_paths(sensor_id, start, end):
+            columns = self._load_columns(path)
+            timestamps = columns['timestamp']
+            if start_us is not None and timestamps[-1] <= start_us:
+                continue
+            if end_us is not None and timestamps[0] > end_us:
+                continue
+
+            # Сегмент целиком внутри интервала - фильтр не нужен
+            mask = None
+            if start_us is not None and timestamps[0] <= start_us:
+                mask = timestamps > start_us
+            if end_us is not None and timestamps[-1] > end_us:
+                mask = (timestamps <= end_us) if mask is None else mask & (timestamps <= end_us)
+
+            for column, values in columns.items():
+                chunks[column].append(values if mask is None else values[mask])
+
+        result = {}
+        for column, parts in chunks.items():
+            dtype = np.int64 if column == 'timestamp' else np.float64
+            result[column] = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        result['timestamp'] = result['timestamp'].astype('datetime64[us]')
+        return result
+
+    def latest(self, sensor_id):
+        """Последнее архивное показание датчика или None"""
+        paths = self._segment_paths(sensor_id)
+        if not paths:
+            return None
+
+        columns = self._load_columns(paths[-1])
+        row = {'timestamp': from_micros(int(columns['timestamp'][-1]))}
+        for column in VALUE_COLUMNS:
+            value = float(columns[column][-1])
+            # NULL хранится как NaN; наружу отдаем None, как основная таблица
+            row[column] = None if math.isnan(value) else value
+        return row
+
+    def statistics(self, sensor_id):
+        """
+        Агрегаты по архиву датчика. Считаются только по заголовкам сегментов,
+        без распаковки данных
+        """
+        stats = {
+            'total_records': 0,
+            'first_record': None,
+            'last_record': None,
+            'columns': {column: {'count': 0, 'sum': 0.0} for column in VALUE_COLUMNS}
+        }
+        for path in self._segment_paths(sensor_id):
+            segment = self._read_header(path)
+            stats['total_records'] += segment.count
+            first, last = from_micros(segment.first_ts), from_micros(segment.last_ts)
+            if stats['first_record'] is None or first < stats['first_record']:
+                stats['first_record'] = first
+            if stats['last_record'] is None or last > stats['last_record']:
+                stats['last_record'] = last
+            for column in VALUE_COLUMNS:
+                stats['columns'][column]['count'] += segment.column_stats[column]['count']
+                stats['columns'][column]['sum'] += segment.column_stats[column]['sum']
+        return stats
+
+    def count(self, sensor_id=None):
+        sensor_ids = self.sensor_ids() if sensor_id is None else [sensor_id]
+        total = 0
+        for sid in sensor_ids:
+            for path in self._segment_paths(sid):
+                total += self._read_header(path).count
+        return total
+
+    def size_bytes(self):
+        total = 0
+        for sensor_id in self.sensor_ids():
+            for path in self._segment_paths(sensor_id):
+                total += os.path.getsize(path)
+        return total
+
+
+if __name__ == "__main__":
+    from database import SensorDatabase
+
+    db = SensorDatabase()
+    moved = db.archive_old_readings()
+    print(f"В архив перенесено {moved} записей, размер архива: {db.archive.size_bytes()} байт")
+    db.close()
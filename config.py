@@ -1,5 +1,6 @@
 # config.py
 import datetime
+import os
 
 # Настройки базы данных PostgreSQL
 DATABASE_CONFIG = {
@@ -50,4 +51,34 @@ SENSOR_LOCATIONS = {
 }
 
 TEST_DATA_DAYS = 30
-TEST_DATA_INTERVAL = 3
\ No newline at end of file
+TEST_DATA_INTERVAL = 3
+
+# Архив (холодное хранилище): показания старше after_days дней переносятся
+# в сжатые колоночные сегменты, по одному файлу на датчик и период ('day' или 'month').
+# Распакованные сегменты кешируются в памяти, cache_bytes - предел кеша
+ARCHIVE_CONFIG = {
+    'path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'),
+    'after_days': 30,
+    'period': 'day',
+    'cache_bytes': 64 * 1024 * 1024
+}
+
+
+# Хранилище показаний: 'postgres' (DATABASE_CONFIG) или 'sqlite' (SQLITE_CONFIG)
+STORAGE_BACKEND = os.environ.get('SENSOR_STORAGE_BACKEND', 'postgres')
+
+# Встраиваемая база для шлюзов, где PostgreSQL слишком тяжел. Рабочий файл лежит
+# в data/ (не в git); при первом запуске туда копируется seed_path
+SQLITE_CONFIG = {
+    'path': os.environ.get(
+        'SENSOR_SQLITE_PATH',
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sensors_data.db')
+    ),
+    'seed_path': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'sensors_data.db'),
+    'pragmas': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -16000
+    }
+}
@@ -1,85 +1,44 @@
-import psycopg2
 import datetime
 import pandas as pd
-from config import DATABASE_CONFIG, SENSOR_LOCATIONS
-import threading
-from psycopg2.extras import RealDictCursor
+from config import SENSOR_LOCATIONS, ARCHIVE_CONFIG
+from archive import SensorArchive
+from storage import create_backend, VALUE_COLUMNS
 
 class SensorDatabase:
-    _local = threading.local()
-    
-    def __init__(self, db_config=DATABASE_CONFIG):
-        self.db_config = db_config
-        self._init_database()
-    
-    def _get_connection(self):
-        if not hasattr(self._local, 'connection'):
-            self._local.connection = psycopg2.connect(**self.db_config)
-            self._local.connection.autocommit = False
-        return self._local.connection
-    
-    def _init_database(self):
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sensor_readings (
-            id SERIAL PRIMARY KEY,
-            sensor_id INTEGER NOT NULL,
-            timestamp TIMESTAMP NOT NULL,
-            noise_level REAL,
-            gas_composition REAL,
-            pressure REAL,
-            humidity REAL,
-            temperature REAL
-        )
-        ''')
-        
-        cursor.execute('''
-        CREATE INDEX IF NOT EXISTS idx_timestamp_sensor 
-        ON sensor_readings(timestamp, sensor_id)
-        ''')
-        
-        conn.commit()
+    def __init__(self, backend=None, archive=None):
+        # Движок хранения выбирается в config.STORAGE_BACKEND
+        self.backend = backend if backend is not None else create_backend()
+        self.archive = archive if archive is not None else SensorArchive()
+        self.backend.init_schema()
     
     def add_reading(self, sensor_id, noise, gas, pressure, humidity, temp, timestamp=None):
         if timestamp is None:
             timestamp = datetime.datetime.now()
         
+        return self.add_readings([(sensor_id, timestamp, noise, gas, pressure, humidity, temp)]) == 1
+    
+    def add_readings(self, rows):
+        """
+        Пакетная запись показаний одной транзакцией. rows - кортежи
+        (sensor_id, timestamp, noise, gas, pressure, humidity, temp).
+        Возвращает количество записанных строк
+        """
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-            INSERT INTO sensor_readings 
-            (sensor_id, timestamp, noise_level, gas_composition, pressure, humidity, temperature)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (sensor_id, timestamp, noise, gas, pressure, humidity, temp))
-            
-            conn.commit()
-            return True
-            
+            return self.backend.insert_readings(rows)
         except Exception as e:
             print(f"Ошибка при добавлении данных: {e}")
-            conn.rollback()
-            return False
+            return 0
     
     def get_sensor_data(self, sensor_id, hours=24):
         """Получить данные конкретного датчика"""
         try:
-            conn = self._get_connection()
             cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=hours)
             
-            query = """
-            SELECT * FROM sensor_readings 
-            WHERE sensor_id = %s AND timestamp > %s
-            ORDER BY timestamp DESC
-            """
-            
-            df = pd.read_sql_query(query, conn, params=[sensor_id, cutoff_time])
+            df = self.backend.read_readings(sensor_id=sensor_id, since=cutoff_time)
+            df = self._with_archive(df, [sensor_id], cutoff_time)
             if not df.empty and 'timestamp' in df.columns:
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
-            return df
+            return df.sort_values('timestamp', ascending=False, ignore_index=True) if not df.empty else df
         except Exception as e:
             print(f"Ошибка при получении данных датчика {sensor_id}: {e}")
             return pd.DataFrame()
@@ -87,18 +46,14 @@ class SensorDatabase:
     def get_all_sensors_data(self, hours=24):
         """Получить данные всех датчиков"""
         try:
-            conn = self._get_connection()
             cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=hours)
             
-            query = """
-            SELECT * FROM sensor_readings 
-            WHERE timestamp > %s
-            ORDER BY sensor_id, timestamp DESC
-            """
-            
-            df = pd.read_sql_query(query, conn, params=[cutoff_time])
+            df = self.backend.read_readings(since=cutoff_time)
+            df = self._with_archive(df, self.archive.sensor_ids(), cutoff_time)
             if not df.empty and 'timestamp' in df.columns:
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
+            if not df.empty:
+                df = df.sort_values(['sensor_id', 'timestamp'], ascending=[True, False], ignore_index=True)
             return df
         except Exception as e:
             print(f"Ошибка при получении всех данных: {e}")
@@ -107,15 +62,21 @@ class SensorDatabase:
     def get_latest_readings(self):
         """Получить последние показания всех датчиков"""
         try:
-            conn = self._get_connection()
+            df = self.backend.latest_readings()
             
-            query = """
-            SELECT DISTINCT ON (sensor_id) *
-            FROM sensor_readings 
-            ORDER BY sensor_id, timestamp DESC
-            """
+            # Датчики, у которых все показания уже в архиве
+            live_ids = set(df['sensor_id']) if not df.empty else set()
+            archived = []
+            for sensor_id in self.archive.sensor_ids():
+                if sensor_id in live_ids:
+                    continue
+                row = self.archive.latest(sensor_id)
+                if row is not None:
+                    archived.append(dict(row, id=None, sensor_id=sensor_id))
+            if archived:
+                df = pd.concat([df, pd.DataFrame(archived, columns=df.columns)], ignore_index=True)
+                df = df.sort_values('sensor_id', ignore_index=True)
             
-            df = pd.read_sql_query(query, conn)
             if not df.empty and 'timestamp' in df.columns:
                 df['timestamp'] = pd.to_datetime(df['timestamp'])
             return df
@@ -123,46 +84,57 @@ class SensorDatabase:
             print(f"Ошибка при получении последних показаний: {e}")
             return pd.DataFrame()
     
+    def get_latest_reading(self, sensor_id):
+        """Последнее показание датчика в виде словаря или None"""
+        try:
+            row = self.backend.latest_reading(sensor_id)
+            return row if row is not None else self.archive.latest(sensor_id)
+        except Exception as e:
+            print(f"Ошибка при получении последнего показания датчика {sensor_id}: {e}")
+            return None
+    
+    def count_readings(self, sensor_id=None):
+        """Количество записей (основная таблица + архив)"""
+        return self.backend.count_readings(sensor_id) + self.archive.count(sensor_id)
+    
+    def count_active_sensors(self, hours=24):
+        """Количество датчиков, присылавших данные за последние hours часов"""
+        cutoff_time = datetime.datetime.now() - datetime.timedelta(hours=hours)
+        return len(self.backend.sensor_ids(since=cutoff_time))
+    
+    def delete_readings(self, sensor_id=None, exclude_sensor_id=None):
+        """Удаляет показания датчика (или всех, кроме exclude_sensor_id) вместе с архивом"""
+        self.backend.delete_readings(sensor_id=sensor_id, exclude_sensor_id=exclude_sensor_id)
+        if sensor_id is not None:
+            self.archive.clear([sensor_id])
+        else:
+            self.archive.clear([sid for sid in self.archive.sensor_ids() if sid != exclude_sensor_id])
+    
     def get_sensor_statistics(self, sensor_id):
         """Статистика для конкретного датчика"""
         stats = {}
         
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            
-            # Средние значения
-            cursor.execute('''
-            SELECT 
-                AVG(noise_level),
-                AVG(gas_composition), 
-                AVG(pressure),
-                AVG(humidity),
-                AVG(temperature)
-            FROM sensor_readings
-            WHERE sensor_id = %s
-            ''', (sensor_id,))
+            live = self.backend.aggregates(sensor_id)
+            # Архивные агрегаты берутся из заголовков сегментов
+            archived = self.archive.statistics(sensor_id)
             
-            averages = cursor.fetchone()
-            stats['averages'] = {
-                'noise_level': float(averages[0]) if averages[0] is not None else 0,
-                'gas_composition': float(averages[1]) if averages[1] is not None else 0,
-                'pressure': float(averages[2]) if averages[2] is not None else 0,
-                'humidity': float(averages[3]) if averages[3] is not None else 0,
-                'temperature': float(averages[4]) if averages[4] is not None else 0
-            }
+            # Средние значения: объединяем суммы и количества основной таблицы и архива
+            stats['averages'] = {}
+            for column in VALUE_COLUMNS:
+                total = live['columns'][column]['sum'] + archived['columns'][column]['sum']
+                count = live['columns'][column]['count'] + archived['columns'][column]['count']
+                stats['averages'][column] = total / count if count else 0
             
             # Количество записей
-            cursor.execute('SELECT COUNT(*) FROM sensor_readings WHERE sensor_id = %s', (sensor_id,))
-            count_result = cursor.fetchone()
-            stats['total_records'] = count_result[0] if count_result else 0
+            stats['total_records'] = live['total_records'] + archived['total_records']
             
             # Временной диапазон
-            cursor.execute('SELECT MIN(timestamp), MAX(timestamp) FROM sensor_readings WHERE sensor_id = %s', (sensor_id,))
-            time_range = cursor.fetchone()
+            first_record = min(filter(None, [live['first_record'], archived['first_record']]), default=None)
+            last_record = max(filter(None, [live['last_record'], archived['last_record']]), default=None)
             stats['time_range'] = {
-                'first_record': time_range[0].strftime('%Y-%m-%d %H:%M:%S') if time_range and time_range[0] else None,
-                'last_record': time_range[1].strftime('%Y-%m-%d %H:%M:%S') if time_range and time_range[1] else None
+                'first_record': first_record.strftime('%Y-%m-%d %H:%M:%S') if first_record else None,
+                'last_record': last_record.strftime('%Y-%m-%d %H:%M:%S') if last_record else None
             }
             
         except Exception as e:
@@ -177,16 +149,50 @@ class SensorDatabase:
     
     def clear_database(self):
         try:
-            conn = self._get_connection()
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM sensor_readings')
-            conn.commit()
+            self.backend.delete_readings()
+            self.archive.clear()
             return True
         except Exception as e:
             print(f"Ошибка при очистке базы данных: {e}")
             return False
     
+    def _with_archive(self, df, sensor_ids, cutoff_time):
+        """Дополняет выборку из основной таблицы архивными показаниями новее cutoff_time"""
+        frames = [df]
+        for sensor_id in sensor_ids:
+            data = self.archive.read(sensor_id, start=cutoff_time)
+            if len(data['timestamp']):
+                archived = pd.DataFrame(data)
+                archived.insert(0, 'sensor_id', sensor_id)
+                archived.insert(0, 'id', None)
+                frames.append(archived[df.columns])
+        if len(frames) == 1:
+            return df
+        return pd.concat([frame for frame in frames if not frame.empty], ignore_index=True)
+    
+    def archive_old_readings(self, days=ARCHIVE_CONFIG['after_days']):
+        """
+        Переносит показания старше days дней из основной таблицы в архив.
+        Возвращает количество перенесенных записей
+        """
+        cutoff_time = datetime.datetime.now() - datetime.timedelta(days=days)
+        moved = 0
+        
+        try:
+            for sensor_id in self.backend.sensor_ids(before=cutoff_time):
+                rows = self.backend.fetch_rows(sensor_id, cutoff_time)
+                moved += self.archive.append(sensor_id, [row[1:] for row in rows])
+                
+                # Удаляем из основной таблицы только после успешной записи сегментов и
+                # только то, что было выбрано: строки, вставленные задним числом
+                # за это время, останутся до следующей архивации
+                self.backend.delete_ids(row[0] for row in rows)
+            
+            return moved
+            
+        except Exception as e:
+            print(f"Ошибка при архивации данных: {e}")
+            return moved
+    
     def close(self):
-        if hasattr(self._local, 'connection'):
-            self._local.connection.close()
-            del self._local.connection
\ No newline at end of file
+        self.backend.close()
\ No newline at end of file
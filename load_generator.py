@@ -0,0 +1,293 @@
+"""
+Нагрузочное тестирование сервера: имитация парка плат ESP32, которые шлют
+показания на /api/esp32_data так же, как eps32_connect_to_server.ino
+(отдельное HTTP-соединение на каждый POST, значения округлены до 0.1).
+
+    python load_generator.py --devices 500 --interval 1 --duration 60
+    python load_generator.py --devices 200 --outage-at 20 --outage-duration 10
+
+Кроме равномерного потока имитируются обрывы связи: плата копит показания
+в буфере и после переподключения отправляет их пачкой. Массовый обрыв
+(--outage-at) имитирует перезагрузку точки доступа для всех плат сразу.
+Отчет: пропускная способность, перцентили задержки, ошибки и прирост
+записей в базе по данным /api/system_stats
+
+Ограничения серверной стороны: /api/esp32_data пишет все показания с
+sensor_id=99 и ставит метку времени datetime.now() в момент приема. Поэтому
+все N плат попадают в один датчик, а досланные из буфера показания
+сохраняются со временем досылки, а не измерения. Генератор все равно
+отправляет device_id и measured_at (время измерения); сервер сейчас
+игнорирует эти поля
+"""
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import datetime
+import threading
+import http.client
+from urllib.parse import urlsplit
+from config import SENSOR_CONFIG
+
+ESP32_ENDPOINT = '/api/esp32_data'
+STATS_ENDPOINT = '/api/system_stats'
+
+LIMITATION_NOTE = ("Сервер пишет все платы в sensor_id=99 со временем приема: "
+                   "device_id и measured_at игнорируются, досылка буфера "
+                   "сохраняется со временем досылки")
+
+# Соответствие полей JSON и ключей SENSOR_CONFIG
+PAYLOAD_FIELDS = ['temperature', 'pressure', 'humidity', 'gas_composition', 'noise_level']
+
+
+class LoadStats:
+    """Результаты запросов, собранные со всех плат"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Задержки успешных и неуспешных запросов отдельно: таймауты и 5xx
+        # не должны выпадать из отчета именно тогда, когда сервер перегружен
+        self.latencies = []
+        self.failed_latencies = []
+        self.errors = {}
+        self.sent = 0
+        self.succeeded = 0
+        self.replayed = 0
+        # Показания, потерянные платой из-за переполнения буфера
+        self.dropped = 0
+
+    def record_dropped(self):
+        with self._lock:
+            self.dropped += 1
+
+    def record(self, latency, error=None, replay=False):
+        with self._lock:
+            self.sent += 1
+            if replay:
+                self.replayed += 1
+            if error is None:
+                self.succeeded += 1
+                self.latencies.append(latency)
+            else:
+                self.failed_latencies.append(latency)
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    @staticmethod
+    def percentile(latencies, p):
+        if not latencies:
+            return None
+        values = sorted(latencies)
+        index = min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))
+        return values[index]
+
+
+class SimulatedDevice(threading.Thread):
+    """Одна плата: случайное блуждание показаний, дрожание интервала, обрывы связи"""
+
+    def __init__(self, device_id, target, args, stats, stop_event, start_time):
+        super().__init__(name=f'esp32-{device_id}', daemon=True)
+        self.device_id = device_id
+        self.host, self.port = target
+        self.args = args
+        self.stats = stats
+        self.stop_event = stop_event
+        self.start_time = start_time
+        self.rng = random.Random(args.seed + device_id if args.seed is not None else None)
+        self.buffer = []
+        self.offline_until = 0.0
+        self.values = {
+            field: self.rng.uniform(SENSOR_CONFIG[field]['gen_min'], SENSOR_CONFIG[field]['gen_max'])
+            for field in PAYLOAD_FIELDS
+        }
+
+    def _next_payload(self):
+        for field in PAYLOAD_FIELDS:
+            config = SENSOR_CONFIG[field]
+            step = (config['gen_max'] - config['gen_min']) * 0.01
+            value = self.values[field] + self.rng.uniform(-step, step)
+            self.values[field] = max(config['gen_min'], min(config['gen_max'], value))
+        # Плата округляет значения до десятых
+        payload = {field: round(value, 1) for field, value in self.values.items()}
+        # Сервер пока игнорирует эти поля, см. LIMITATION_NOTE
+        payload['device_id'] = f'sim-{self.device_id:04d}'
+        payload['measured_at'] = datetime.datetime.now().isoformat(timespec='seconds')
+        return payload
+
+    def _post(self, payload, replay=False):
+        body = json.dumps(payload)
+        start = time.perf_counter()
+        error = None
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.args.timeout)
+        try:
+            conn.request('POST', ESP32_ENDPOINT, body=body, headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            data = response.read()
+            if response.status != 200:
+                error = f'HTTP {response.status}'
+            else:
+                result = json.loads(data)
+                if not isinstance(result, dict):
+                    error = 'invalid json'
+                elif not result.get('success'):
+                    error = 'success=false'
+        except socket.timeout:
+            error = 'timeout'
+        except (ConnectionError, OSError) as e:
+            error = type(e).__name__
+        except http.client.HTTPException as e:
+            # IncompleteRead, BadStatusLine, LineTooLong не наследуют OSError;
+            # без этого поток платы падает молча вместе с буфером
+            error = type(e).__name__
+        except ValueError:
+            error = 'invalid json'
+        finally:
+            conn.close()
+        self.stats.record(time.perf_counter() - start, error, replay)
+        return error is None
+
+    def _is_offline(self, now):
+        elapsed = now - self.start_time
+        outage_at = self.args.outage_at
+        if outage_at is not None and outage_at <= elapsed < outage_at + self.args.outage_duration:
+            return True
+        if now < self.offline_until:
+            return True
+        if self.rng.random() < self.args.disconnect_rate:
+            self.offline_until = now + self.rng.uniform(1, self.args.max_offline)
+            return True
+        return False
+
+    def run(self):
+        # Платы включаются не одновременно
+        self.stop_event.wait(self.rng.uniform(0, self.args.interval))
+        while not self.stop_event.is_set():
+            cycle_start = time.monotonic()
+            payload = self._next_payload()
+
+            if self._is_offline(time.time()):
+                if len(self.buffer) < self.args.buffer_size:
+                    self.buffer.append(payload)
+                else:
+                    self.stats.record_dropped()
+            else:
+                # После переподключения сначала досылаем накопленное
+                while self.buffer and not self.stop_event.is_set():
+                    if not self._post(self.buffer[0], replay=True):
+                        break
+                    self.buffer.pop(0)
+                self._post(payload)
+
+            jitter = self.rng.uniform(-self.args.jitter, self.args.jitter)
+            delay = max(0.0, self.args.interval + jitter - (time.monotonic() - cycle_start))
+            self.stop_event.wait(delay)
+
+
+def fetch_total_records(target, timeout):
+    conn = http.client.HTTPConnection(*target, timeout=timeout)
+    try:
+        conn.request('GET', STATS_ENDPOINT)
+        result = json.loads(conn.getresponse().read())
+        return result.get('total_records') if isinstance(result, dict) else None
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+
+
+def print_latencies(title, latencies):
+    if not latencies:
+        return
+    print(f"{title} (мс, {len(latencies)} запросов):")
+    for p in (50, 90, 95, 99):
+        print(f"    p{p}: {LoadStats.percentile(latencies, p) * 1000:.1f}")
+    print(f"    max: {max(latencies) * 1000:.1f}")
+
+
+def print_report(stats, elapsed, offered_rate, records_before, records_after):
+    print("\n===== Результаты нагрузочного теста =====")
+    print(f"Примечание: {LIMITATION_NOTE}")
+    print(f"Длительность:              {elapsed:.1f} с")
+    print(f"Отправлено запросов:       {stats.sent} (из них досылка буфера: {stats.replayed})")
+    # Эти показания не были отправлены вовсе и не входят в ошибки
+    print(f"Потеряно (буфер полон):    {stats.dropped}")
+    print(f"Успешных:                  {stats.succeeded}")
+    print(f"Заданная нагрузка:         {offered_rate:.1f} запросов/с")
+    print(f"Фактически отправлено:     {stats.sent / elapsed:.1f} запросов/с")
+    print(f"Пропускная способность:    {stats.succeeded / elapsed:.1f} успешных запросов/с")
+    # Каждая плата ждет ответа на свой запрос, поэтому медленный сервер
+    # незаметно снижает подаваемую нагрузку
+    if stats.sent / elapsed < offered_rate * 0.9:
+        print("    ВНИМАНИЕ: отправлено меньше 90% заданной нагрузки - сервер не успевает "
+              "отвечать, либо платы были без связи")
+
+    error_count = stats.sent - stats.succeeded
+    error_rate = error_count / stats.sent * 100 if stats.sent else 0
+    print(f"Ошибки:                    {error_count} ({error_rate:.2f}%)")
+    for error, count in sorted(stats.errors.items(), key=lambda item: -item[1]):
+        print(f"    {error}: {count}")
+
+    print_latencies("Задержка успешных запросов", stats.latencies)
+    print_latencies("Задержка неуспешных запросов", stats.failed_latencies)
+
+    if records_before is not None and records_after is not None:
+        growth = records_after - records_before
+        print(f"Прирост записей в базе:    {growth} ({growth / elapsed:.1f} записей/с)")
+        if growth != stats.succeeded:
+            print(f"    ВНИМАНИЕ: успешных ответов {stats.succeeded}, записей добавлено {growth}")
+    else:
+        print("Прирост записей в базе:    недоступно (нет ответа от /api/system_stats)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Имитация парка ESP32 для нагрузочного тестирования")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="адрес сервера")
+    parser.add_argument('--devices', type=int, default=50, help="количество плат")
+    parser.add_argument('--interval', type=float, default=1.0, help="период отправки, с")
+    parser.add_argument('--jitter', type=float, default=0.2, help="случайное отклонение периода, с")
+    parser.add_argument('--duration', type=float, default=30.0, help="длительность теста, с")
+    parser.add_argument('--timeout', type=float, default=5.0, help="таймаут HTTP-запроса, с")
+    parser.add_argument('--disconnect-rate', type=float, default=0.001,
+                        help="вероятность обрыва связи на каждом цикле платы")
+    parser.add_argument('--max-offline', type=float, default=15.0, help="максимальная длительность обрыва, с")
+    parser.add_argument('--buffer-size', type=int, default=60, help="сколько показаний плата копит без связи")
+    parser.add_argument('--outage-at', type=float, default=None, help="момент массового обрыва от старта, с")
+    parser.add_argument('--outage-duration', type=float, default=10.0, help="длительность массового обрыва, с")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    target = (url.hostname, url.port or 80)
+
+    records_before = fetch_total_records(target, args.timeout)
+    if records_before is None:
+        print(f"Сервер {args.url} не отвечает на {STATS_ENDPOINT}, прирост базы не будет посчитан")
+
+    print(f"Запуск {args.devices} плат: период {args.interval} с, длительность {args.duration} с")
+    stats = LoadStats()
+    stop_event = threading.Event()
+    start_time = time.time()
+    devices = [SimulatedDevice(i, target, args, stats, stop_event, start_time) for i in range(args.devices)]
+    for device in devices:
+        device.start()
+
+    started = time.perf_counter()
+    try:
+        while time.perf_counter() - started < args.duration:
+            time.sleep(min(5.0, args.duration - (time.perf_counter() - started)))
+            print(f"  {time.perf_counter() - started:5.0f} с: отправлено {stats.sent}, успешно {stats.succeeded}")
+    except KeyboardInterrupt:
+        print("Остановка...")
+    stop_event.set()
+    for device in devices:
+        device.join(args.timeout + 1)
+    elapsed = time.perf_counter() - started
+
+    records_after = fetch_total_records(target, args.timeout)
+    print_report(stats, elapsed, args.devices / args.interval, records_before, records_after)
+    return 1 if stats.sent and stats.succeeded < stats.sent else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+import os
+import shutil
+import sqlite3
+import datetime
+import threading
+import pandas as pd
+from config import STORAGE_BACKEND, DATABASE_CONFIG, SQLITE_CONFIG
+
+# Колонки значений в порядке хранения в таблице sensor_readings
+VALUE_COLUMNS = ['noise_level', 'gas_composition', 'pressure', 'humidity', 'temperature']
+
+
+class StorageBackend:
+    """
+    Базовый класс хранилища показаний. Весь SQL, общий для движков, живет здесь;
+    наследники задают подключение, схему и запросы, которые у движков различаются.
+    Запросы пишутся с плейсхолдером %s, наследник подставляет свой
+    """
+
+    name = None
+    placeholder = '%s'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    # ----- Подключение -----
+
+    def _connect(self):
+        raise NotImplementedError
+
+    def _get_connection(self):
+        if not hasattr(self._local, 'connection'):
+            self._local.connection = self._connect()
+        return self._local.connection
+
+    def _sql(self, query):
+        return query if self.placeholder == '%s' else query.replace('%s', self.placeholder)
+
+    def _params(self, params):
+        """Приведение параметров запроса к типам, которые понимает драйвер"""
+        return params
+
+    def _execute(self, query, params=()):
+        cursor = self._get_connection().cursor()
+        cursor.execute(self._sql(query), self._params(params))
+        return cursor
+
+    def _read_frame(self, query, params=()):
+        return pd.read_sql_query(self._sql(query), self._get_connection(),
+                                 params=list(self._params(params)) or None)
+
+    def _write(self, query, params_list):
+        """Выполняет запрос для набора параметров в одной транзакции"""
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(self._sql(query), [self._params(params) for params in params_list])
+            conn.commit()
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+
+    @staticmethod
+    def _as_datetime(value):
+        # SQLite хранит метки времени текстом
+        if isinstance(value, str):
+            return datetime.datetime.fromisoformat(value)
+        return value
+
+    def _sum(self, column):
+        """Сумма колонки REAL с накоплением в двойной точности"""
+        return f'SUM({column})'
+
+    def init_schema(self):
+        raise NotImplementedError
+
+    def close(self):
+        if hasattr(self._local, 'connection'):
+            self._local.connection.close()
+            del self._local.connection
+
+    # ----- Запись -----
+
+    def insert_readings(self, rows):
+        """
+        Добавляет показания одной транзакцией. rows - кортежи
+        (sensor_id, timestamp, noise_level, gas_composition, pressure, humidity, temperature)
+        """
+        rows = list(rows)
+        if rows:
+            self._write('''
+            INSERT INTO sensor_readings
+            (sensor_id, timestamp, noise_level, gas_composition, pressure, humidity, temperature)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ''', rows)
+        return len(rows)
+
+    def delete_readings(self, sensor_id=None, exclude_sensor_id=None, before=None):
+        """Удаляет показания по условиям; без условий очищает таблицу"""
+        where, params = self._where(sensor_id=sensor_id, exclude_sensor_id=exclude_sensor_id, before=before)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self._sql('DELETE FROM sensor_readings' + where), self._params(params))
+            conn.commit()
+            return cursor.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+
+    def delete_ids(self, ids, batch_size=500):
+        """Удаляет показания с указанными id одной транзакцией"""
+        ids = list(ids)
+        conn = self._get_connection()
+        try:
+            cursor = conn.cursor()
+            deleted = 0
+            for i in range(0, len(ids), batch_size):
+                batch = ids[i:i + batch_size]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(self._sql(f'DELETE FROM sensor_readings WHERE id IN ({placeholders})'), batch)
+                deleted += cursor.rowcount
+            conn.commit()
+            return deleted
+        except Exception:
+            conn.rollback()
+            raise
+
+    # ----- Чтение -----
+
+    @staticmethod
+    def _where(sensor_id=None, exclude_sensor_id=None, since=None, before=None):
+        conditions, params = [], []
+        if sensor_id is not None:
+            conditions.append('sensor_id = %s')
+            params.append(sensor_id)
+        if exclude_sensor_id is not None:
+            conditions.append('sensor_id != %s')
+            params.append(exclude_sensor_id)
+        if since is not None:
+            conditions.append('timestamp > %s')
+            params.append(since)
+        if before is not None:
+            conditions.append('timestamp < %s')
+            params.append(before)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+    def read_readings(self, sensor_id=None, since=None):
+        """Показания в виде DataFrame, по датчикам и от новых к старым"""
+        where, params = self._where(sensor_id=sensor_id, since=since)
+        return self._read_frame(
+            'SELECT * FROM sensor_readings' + where + ' ORDER BY sensor_id, timestamp DESC', params
+        )
+
+    def fetch_rows(self, sensor_id, before):
+        """Показания датчика старше before в виде кортежей (id, timestamp, значения...), от старых к новым"""
+        cursor = self._execute('''
+        SELECT id, timestamp, noise_level, gas_composition, pressure, humidity, temperature
+        FROM sensor_readings
+        WHERE sensor_id = %s AND timestamp < %s
+        ORDER BY timestamp
+        ''', (sensor_id, before))
+        return [(row[0], self._as_datetime(row[1])) + tuple(row[2:]) for row in cursor.fetchall()]
+
+    def latest_readings(self):
+        """Последнее показание каждого датчика (DataFrame)"""
+        raise NotImplementedError
+
+    def latest_reading(self, sensor_id):
+        """Последнее показание датчика в виде словаря или None"""
+        cursor = self._execute('''
+        SELECT timestamp, noise_level, gas_composition, pressure, humidity, temperature
+        FROM sensor_readings
+        WHERE sensor_id = %s
+        ORDER BY timestamp DESC
+        LIMIT 1
+        ''', (sensor_id,))
+        result = cursor.fetchone()
+        if result is None:
+            return None
+        row = dict(zip(['timestamp'] + VALUE_COLUMNS, result))
+        row['timestamp'] = self._as_datetime(row['timestamp'])
+        return row
+
+    def count_readings(self, sensor_id=None):
+        where, params = self._where(sensor_id=sensor_id)
+        return self._execute('SELECT COUNT(*) FROM sensor_readings' + where, params).fetchone()[0]
+
+    def sensor_ids(self, since=None, before=None):
+        where, params = self._where(since=since, before=before)
+        cursor = self._execute('SELECT DISTINCT sensor_id FROM sensor_readings' + where, params)
+        return sorted(row[0] for row in cursor.fetchall())
+
+    def aggregates(self, sensor_id):
+        """
+        Агрегаты датчика: количество записей, временной диапазон и
+        сумма/количество не-NULL значений по каждой колонке
+        """
+        columns = ', '.join(f'{self._sum(c)}, COUNT({c})' for c in VALUE_COLUMNS)
+        cursor = self._execute(
+            f'SELECT COUNT(*), MIN(timestamp), MAX(timestamp), {columns} FROM sensor_readings WHERE sensor_id = %s',
+            (sensor_id,)
+        )
+        result = cursor.fetchone()
+        stats = {
+            'total_records': result[0] or 0,
+            'first_record': self._as_datetime(result[1]),
+            'last_record': self._as_datetime(result[2]),
+            'columns': {}
+        }
+        for i, column in enumerate(VALUE_COLUMNS):
+            stats['columns'][column] = {
+                'sum': float(result[3 + 2 * i] or 0),
+                'count': result[4 + 2 * i] or 0
+            }
+        return stats
+
+
+class PostgresBackend(StorageBackend):
+    name = 'postgres'
+
+    def __init__(self, db_config=DATABASE_CONFIG):
+        super().__init__()
+        self.db_config = db_config
+
+    def _connect(self):
+        import psycopg2
+        connection = psycopg2.connect(**self.db_config)
+        connection.autocommit = False
+        return connection
+
+    def _sum(self, column):
+        # SUM(real) в PostgreSQL копит сумму в float4 и теряет точность
+        # на больших выборках; SQLite и так суммирует в double
+        return f'SUM({column}::double precision)'
+
+    def init_schema(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sensor_readings (
+            id SERIAL PRIMARY KEY,
+            sensor_id INTEGER NOT NULL,
+            timestamp TIMESTAMP NOT NULL,
+            noise_level REAL,
+            gas_composition REAL,
+            pressure REAL,
+            humidity REAL,
+            temperature REAL
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_timestamp_sensor
+        ON sensor_readings(timestamp, sensor_id)
+        ''')
+
+        conn.commit()
+
+    def latest_readings(self):
+        return self._read_frame('''
+        SELECT DISTINCT ON (sensor_id) *
+        FROM sensor_readings
+        ORDER BY sensor_id, timestamp DESC
+        ''')
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Встраиваемое хранилище для шлюзов без PostgreSQL. Схема совместима
+    с templates/sensors_data.db; сам этот файл используется только как
+    начальные данные и не изменяется
+    """
+
+    name = 'sqlite'
+    placeholder = '?'
+
+    def __init__(self, sqlite_config=SQLITE_CONFIG):
+        super().__init__()
+        self.path = sqlite_config['path']
+        self.pragmas = sqlite_config.get('pragmas', {})
+        self._prepare_file(sqlite_config.get('seed_path'))
+
+    def _prepare_file(self, seed_path):
+        if os.path.exists(self.path):
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if seed_path and os.path.exists(seed_path):
+            shutil.copyfile(seed_path, self.path)
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=self.pragmas.get('busy_timeout', 5000) / 1000)
+        for pragma, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {pragma} = {value}')
+        return connection
+
+    def _params(self, params):
+        # Метки времени передаются строкой фиксированной ширины (как в
+        # templates/sensors_data.db), чтобы они сравнивались как даты.
+        # Глобальные адаптеры sqlite3 не регистрируем, чтобы не менять
+        # поведение sqlite3 для остального процесса
+        return [
+            value.isoformat(' ', timespec='microseconds') if isinstance(value, datetime.datetime) else value
+            for value in params
+        ]
+
+    def _read_frame(self, query, params=()):
+        df = super()._read_frame(query, params)
+        if 'timestamp' in df.columns:
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+        return df
+
+    def init_schema(self):
+        conn = self._get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sensor_readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sensor_id INTEGER NOT NULL,
+            timestamp DATETIME NOT NULL,
+            noise_level REAL,
+            gas_composition REAL,
+            pressure REAL,
+            humidity REAL,
+            temperature REAL
+        )
+        ''')
+
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_timestamp_sensor
+        ON sensor_readings(timestamp, sensor_id)
+        ''')
+
+        # Почти все выборки идут по одному датчику за интервал времени
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sensor_timestamp
+        ON sensor_readings(sensor_id, timestamp)
+        ''')
+
+        conn.commit()
+
+    def latest_readings(self):
+        # В SQLite нет DISTINCT ON: берем максимум времени по каждому датчику
+        return self._read_frame('''
+        SELECT r.*
+        FROM sensor_readings r
+        JOIN (
+            SELECT sensor_id, MAX(timestamp) AS max_timestamp
+            FROM sensor_readings
+            GROUP BY sensor_id
+        ) latest ON r.sensor_id = latest.sensor_id AND r.timestamp = latest.max_timestamp
+        ORDER BY r.sensor_id, r.id DESC
+        ''').drop_duplicates('sensor_id', ignore_index=True)
+
+
+BACKENDS = {
+    PostgresBackend.name: PostgresBackend,
+    SQLiteBackend.name: SQLiteBackend,
+}
+
+
+def create_backend(name=STORAGE_BACKEND):
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестное хранилище: {name}")
+    return BACKENDS[name]()
@@ -0,0 +1,228 @@
+"""
+Общий набор проверок совместимости и замеров производительности для хранилищ.
+Каждый движок должен проходить одни и те же проверки, чтобы его можно было
+выбрать для площадки через config.STORAGE_BACKEND.
+
+    python storage_benchmark.py sqlite
+    python storage_benchmark.py sqlite postgres --pg-dbname sensor_data_test --rows 50000
+
+ВНИМАНИЕ: проверки очищают таблицу sensor_readings, поэтому для PostgreSQL
+используется отдельная база (--pg-dbname), а для SQLite - временный файл
+"""
+import os
+import sys
+import math
+import time
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+from archive import SensorArchive
+from database import SensorDatabase
+from storage import PostgresBackend, SQLiteBackend, VALUE_COLUMNS
+from config import DATABASE_CONFIG, SQLITE_CONFIG
+
+
+def make_backend(name, workdir, pg_dbname):
+    if name == 'sqlite':
+        return SQLiteBackend(dict(SQLITE_CONFIG, path=os.path.join(workdir, 'bench.db'), seed_path=None))
+    if name == 'postgres':
+        if pg_dbname == DATABASE_CONFIG['dbname']:
+            raise ValueError("Нельзя запускать проверки на рабочей базе PostgreSQL")
+        return PostgresBackend(dict(DATABASE_CONFIG, dbname=pg_dbname))
+    raise ValueError(f"Неизвестное хранилище: {name}")
+
+
+def make_rows(sensor_ids, start, count, interval_minutes=3):
+    rows = []
+    for sensor_id in sensor_ids:
+        for i in range(count):
+            rows.append((
+                sensor_id,
+                start + datetime.timedelta(minutes=interval_minutes * i),
+                round(random.uniform(0.0, 60.0), 1),
+                round(random.uniform(400.0, 600.0), 1),
+                round(random.uniform(98.0, 105.0), 1),
+                round(random.uniform(30.0, 60.0), 1),
+                round(random.uniform(18.0, 24.0), 1)
+            ))
+    return rows
+
+
+# ----- Проверки совместимости -----
+
+def check_insert_and_count(db, now):
+    rows = make_rows([1, 2], now - datetime.timedelta(hours=5), 50)
+    assert db.add_readings(rows) == 100
+    assert db.add_reading(3, 1.0, 2.0, 3.0, 4.0, 5.0, now)
+    assert db.count_readings() == 101
+    assert db.count_readings(1) == 50
+    assert db.count_active_sensors(hours=24) == 3
+
+
+def check_sensor_data_window(db, now):
+    db.add_readings(make_rows([1], now - datetime.timedelta(hours=48), 960))
+    df = db.get_sensor_data(1, hours=24)
+    assert len(df) == 479, len(df)
+    assert df['timestamp'].is_monotonic_decreasing
+    assert df['timestamp'].min() > now - datetime.timedelta(hours=24)
+    assert list(df.columns) == ['id', 'sensor_id', 'timestamp'] + VALUE_COLUMNS
+
+
+def check_all_sensors_order(db, now):
+    db.add_readings(make_rows([2, 1], now - datetime.timedelta(hours=2), 10))
+    df = db.get_all_sensors_data(hours=24)
+    assert list(df['sensor_id']) == [1] * 10 + [2] * 10
+    assert df[df['sensor_id'] == 1]['timestamp'].is_monotonic_decreasing
+
+
+def check_latest(db, now):
+    db.add_readings(make_rows([1, 2, 5], now - datetime.timedelta(hours=1), 10))
+    db.add_reading(2, 11.0, 12.0, 13.0, 14.0, 15.0, now)
+    latest = db.get_latest_readings()
+    assert list(latest['sensor_id']) == [1, 2, 5]
+    row = latest[latest['sensor_id'] == 2].iloc[0]
+    assert row['timestamp'] == now and row['temperature'] == 15.0
+    single = db.get_latest_reading(2)
+    assert single['timestamp'] == now and single['noise_level'] == 11.0
+    assert db.get_latest_reading(42) is None
+
+
+def check_statistics(db, now):
+    db.add_reading(1, 10.0, 400.0, 100.0, 40.0, 20.0, now - datetime.timedelta(hours=2))
+    db.add_reading(1, 20.0, 500.0, 102.0, 50.0, 22.0, now - datetime.timedelta(hours=1))
+    db.add_reading(1, None, 600.0, 104.0, 60.0, 24.0, now)
+    stats = db.get_sensor_statistics(1)
+    assert stats['total_records'] == 3
+    # AVG игнорирует NULL
+    assert math.isclose(stats['averages']['noise_level'], 15.0)
+    assert math.isclose(stats['averages']['gas_composition'], 500.0)
+    assert stats['time_range']['first_record'] == (now - datetime.timedelta(hours=2)).strftime('%Y-%m-%d %H:%M:%S')
+    assert stats['time_range']['last_record'] == now.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def check_delete(db, now):
+    db.add_readings(make_rows([1, 2, 99], now - datetime.timedelta(hours=1), 5))
+    db.delete_readings(exclude_sensor_id=99)
+    assert db.count_readings() == 5
+    db.delete_readings(sensor_id=99)
+    assert db.count_readings() == 0
+
+
+def check_archive_transparency(db, now):
+    db.add_readings(make_rows([1, 2], now - datetime.timedelta(days=40), 40 * 480))
+    before_stats = db.get_sensor_statistics(1)
+    before_window = db.get_sensor_data(1, hours=24 * 35)
+    moved = db.archive_old_readings(days=30)
+    assert moved > 0 and db.archive.count() == moved
+    assert db.count_readings() == 2 * 40 * 480
+    after_stats = db.get_sensor_statistics(1)
+    assert after_stats['total_records'] == before_stats['total_records']
+    assert after_stats['time_range'] == before_stats['time_range']
+    for column in VALUE_COLUMNS:
+        assert math.isclose(after_stats['averages'][column], before_stats['averages'][column])
+    after_window = db.get_sensor_data(1, hours=24 * 35)
+    assert list(after_window['timestamp']) == list(before_window['timestamp'])
+    assert list(after_window['pressure']) == list(before_window['pressure'])
+
+
+def check_archive_duplicates(db, now):
+    # Одинаковые показания с одной меткой времени - разные записи
+    old = now - datetime.timedelta(days=40)
+    db.add_readings([(1, old, 1.0, 2.0, 3.0, 4.0, 5.0)] * 3 + [(1, old, 9.0, None, 3.0, 4.0, 5.0)])
+    assert db.archive_old_readings(days=30) == 4
+    assert db.count_readings(1) == 4
+    # Повторная архивация тех же строк после сбоя не дублирует их
+    rows = [(old, 1.0, 2.0, 3.0, 4.0, 5.0)] * 3 + [(old, 9.0, None, 3.0, 4.0, 5.0)]
+    assert db.archive.append(1, rows) == 0
+    assert db.count_readings(1) == 4
+
+
+CHECKS = [
+    check_insert_and_count,
+    check_sensor_data_window,
+    check_all_sensors_order,
+    check_latest,
+    check_statistics,
+    check_delete,
+    check_archive_transparency,
+    check_archive_duplicates,
+]
+
+
+def run_conformance(db):
+    failed = 0
+    for check in CHECKS:
+        db.clear_database()
+        now = datetime.datetime.now().replace(microsecond=0)
+        try:
+            check(db, now)
+            print(f"  OK    {check.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"  FAIL  {check.__name__}: {e!r}")
+    return failed
+
+
+# ----- Замеры -----
+
+def timed(label, func, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"  {label:<40} {elapsed * 1000:10.2f} мс")
+    return elapsed
+
+
+def run_benchmark(db, rows_per_sensor):
+    db.clear_database()
+    now = datetime.datetime.now()
+    sensor_ids = [1, 2, 3, 4, 5]
+    rows = make_rows(sensor_ids, now - datetime.timedelta(minutes=3 * rows_per_sensor), rows_per_sensor)
+
+    elapsed = timed(f"пакетная запись {len(rows)} строк", lambda: db.add_readings(rows))
+    print(f"  {'':<40} {len(rows) / elapsed:10.0f} строк/с")
+
+    single = make_rows([99], now, 200, interval_minutes=0)
+    elapsed = timed("200 одиночных записей (как от ESP32)",
+                    lambda: [db.add_reading(r[0], *r[2:], timestamp=r[1]) for r in single])
+    print(f"  {'':<40} {200 / elapsed:10.0f} строк/с")
+
+    timed("get_sensor_data за 24 часа", lambda: db.get_sensor_data(1, 24), repeat=5)
+    timed("get_sensor_data за всю историю", lambda: db.get_sensor_data(1, 24 * 365), repeat=3)
+    timed("get_latest_readings", db.get_latest_readings, repeat=5)
+    timed("get_sensor_statistics", lambda: db.get_sensor_statistics(1), repeat=5)
+    db.clear_database()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка совместимости и замеры хранилищ показаний")
+    parser.add_argument('backends', nargs='*', default=['sqlite'], choices=['sqlite', 'postgres'])
+    parser.add_argument('--pg-dbname', default='sensor_data_test',
+                        help="отдельная база PostgreSQL для проверок (будет очищена)")
+    parser.add_argument('--rows', type=int, default=10000, help="строк на датчик для замеров")
+    parser.add_argument('--skip-benchmark', action='store_true')
+    args = parser.parse_args()
+
+    failed = 0
+    for name in args.backends:
+        workdir = tempfile.mkdtemp(prefix=f'storage_{name}_')
+        try:
+            db = SensorDatabase(backend=make_backend(name, workdir, args.pg_dbname),
+                                archive=SensorArchive(os.path.join(workdir, 'archive')))
+            print(f"Хранилище {name}: проверки совместимости")
+            failed += run_conformance(db)
+            if not args.skip_benchmark:
+                print(f"Хранилище {name}: замеры ({args.rows} строк на датчик)")
+                run_benchmark(db, args.rows)
+            db.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -94,9 +94,7 @@ class TestDataGenerator:
     def _save_batch(self, batch_data):
         """Сохранение батча данных в базу"""
         try:
-            for data in batch_data:
-                sensor_id, timestamp, noise, gas, pressure, humidity, temperature = data
-                self.db.add_reading(sensor_id, noise, gas, pressure, humidity, temperature, timestamp)
+            self.db.add_readings(batch_data)
         except Exception as e:
             print(f"Ошибка при сохранении батча: {e}")
 